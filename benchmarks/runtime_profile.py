@@ -0,0 +1,166 @@
+"""Compare the default and fast runtime profiles.
+
+Measures cold start (process launch to `import bot` done), gateway payload
+decode throughput and command dispatch latency through the bot's real
+on_message for each profile. The default profile is measured with the stock
+json module. Every
+profile runs in its own subprocess because the event loop policy is global.
+
+    python benchmarks/runtime_profile.py
+    python benchmarks/runtime_profile.py --payloads recorded.jsonl
+
+payloads/gateway_events.jsonl is an anonymised sample in the recorded format.
+To capture real traffic, run the bot with RECORD_GATEWAY_PAYLOADS=<file>.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PAYLOADS = os.path.join(ROOT, "benchmarks", "payloads", "gateway_events.jsonl")
+sys.path.insert(0, ROOT)
+
+from runtime_profile import PROFILES, install_profile, json_codec  # noqa: E402
+
+
+def cold_start(profile, runs):
+    """Median wall time of a fresh interpreter applying the profile and importing the bot."""
+    code = f"import runtime_profile; runtime_profile.install_profile({profile!r}); import bot"
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def decode_throughput(loads, payloads, seconds=2.0):
+    """Payloads decoded per second, cycling through the recording."""
+    decoded = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for payload in payloads:
+            loads(payload)
+        decoded += len(payloads)
+    return decoded / (time.perf_counter() - started)
+
+
+BENCH_USER = {"id": "1", "username": "dankfather-bench", "discriminator": "0", "avatar": None, "bot": True}
+
+
+def load_guilds(state, loads, payloads):
+    """Feed the recording's GUILD_CREATE events into the bot's cache so messages resolve."""
+    import discord
+    state.user = discord.ClientUser(state=state, data=BENCH_USER)  # What READY would have set
+    for raw in payloads:
+        event = loads(raw)
+        if event.get("t") == "GUILD_CREATE":
+            state._add_guild_from_data(event["d"])
+
+
+async def command_latency(loads, payloads, commands, burst=100):
+    """Latency from receiving a MESSAGE_CREATE to the bot finishing with it.
+
+    Each message is decoded, turned into a discord.Message by the bot's own
+    connection state and handed to the real on_message, which goes through
+    get_context, the command limiter and invoke. Only ctx.send is stubbed out.
+    """
+    import discord
+    from discord.ext import commands as ext_commands
+    import bot as bot_module
+    bot = bot_module.bot
+
+    async def send(ctx, *args, **kwargs):
+        await asyncio.sleep(0)  # Stands in for the HTTP round trip without making one
+
+    ext_commands.Context.send = send
+    # Replaying the same few users thousands of times a second would otherwise just
+    # measure the limiter refusing them. The buckets are still checked on every message.
+    for command in bot.commands:
+        bot_module.command_limiter.configure(command.name, 1e9, 10**9, "user")
+        bot_module.command_limiter.configure(command.name, 1e9, 10**9, "channel")
+
+    state = bot._connection
+    load_guilds(state, loads, payloads)
+    messages = [p for p in payloads if '"t":"MESSAGE_CREATE"' in p.replace(" ", "")]
+    if not messages:
+        raise SystemExit("The payload file has no MESSAGE_CREATE events.")
+    latencies = []
+
+    async def handle(raw, received):
+        data = loads(raw)["d"]
+        channel, _ = state._get_guild_channel(data)
+        await bot.on_message(discord.Message(state=state, channel=channel, data=data))
+        latencies.append(time.perf_counter() - received)
+
+    loop = asyncio.get_running_loop()
+    sent = 0
+    while sent < commands:
+        tasks = []
+        for i in range(burst):
+            raw = messages[(sent + i) % len(messages)]
+            tasks.append(loop.create_task(handle(raw, time.perf_counter())))
+        await asyncio.gather(*tasks)
+        sent += burst
+    latencies.sort()
+    return {
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+    }
+
+
+def run_child(profile, payloads_path, commands):
+    installed = install_profile(profile)
+    import discord.utils
+    if profile == "default":
+        # Compare against the stock json module even if discord.py would pick up orjson
+        loads, dumps, installed["json"] = json_codec(profile)
+        discord.utils._from_json = loads
+        discord.utils._to_json = dumps
+    with open(payloads_path, encoding="utf-8") as f:
+        payloads = [line.rstrip("\n") for line in f if line.strip()]
+    loads = discord.utils._from_json  # Whatever the profile left in place for the gateway
+    result = dict(installed)
+    result["decode_per_s"] = decode_throughput(loads, payloads)
+    result["decode_mb_per_s"] = result["decode_per_s"] * sum(map(len, payloads)) / len(payloads) / 1e6
+    result.update(asyncio.run(command_latency(loads, payloads, commands)))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payloads", default=DEFAULT_PAYLOADS)
+    parser.add_argument("--commands", type=int, default=200000, help="commands dispatched per profile")
+    parser.add_argument("--starts", type=int, default=5, help="cold starts per profile")
+    parser.add_argument("--child", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.payloads, args.commands)
+        return
+
+    rows = []
+    for profile in PROFILES:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", profile,
+             "--payloads", args.payloads, "--commands", str(args.commands)],
+            cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        result["cold_start_ms"] = cold_start(profile, args.starts) * 1000
+        rows.append(result)
+
+    print(f"{'Profile':<8} {'Loop':<8} {'JSON':<7} {'Cold start':>11} {'Decode/s':>10} {'MB/s':>7} {'p50':>9} {'p99':>9}")
+    for r in rows:
+        print(f"{r['profile']:<8} {r['event_loop']:<8} {r['json']:<7} {r['cold_start_ms']:>9.0f}ms "
+              f"{r['decode_per_s']:>10.0f} {r['decode_mb_per_s']:>7.1f} {r['p50_us']:>7.1f}us {r['p99_us']:>7.1f}us")
+
+
+if __name__ == "__main__":
+    main()
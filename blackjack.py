@@ -1,9 +1,97 @@
+import time
 import random
+import asyncio
 import discord
 from discord.ext import commands
+from utils.settings import guild_settings, TABLE_RULES
+from spectator import hub, blackjack_state
+from utils.compute import compute_pool, ComputeQueueFull
 
 games = {}
 
+# The cards deal_card draws from, by deck mode and by who is being dealt to
+DECKS = {
+    'normal': {
+        'player': [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4,
+        'house': [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4,
+    },
+    'stacked': {
+        'player': [2]*1 + [3]*1 + [4]*1 + [5]*2 + [6]*2 + [7]*2 + [8]*2 + [9]*2 + [10]*8 + [11]*1,
+        'house': [2]*5 + [3]*5 + [4]*5 + [5]*2 + [6]*2 + [7]*2 + [8]*1 + [9]*1 + [10]*2 + [11]*1,
+    },
+}
+
+# Hand codes used for settlement: 4-21 are plain totals, then a bust and a natural blackjack
+BUST = 22
+NATURAL = 23
+
+def settle(player, house):
+    """Result text and payout (in bets) for a player hand code against a house hand code."""
+    if player == NATURAL and house != NATURAL:
+        return "Blackjack! (Natural) You win!", 1.5
+    if house == NATURAL and player != NATURAL:
+        return "House has blackjack! (Natural) House wins!", -1
+    if player == NATURAL and house == NATURAL:
+        return "Both have blackjack! It's a tie!", 0
+    if player == BUST and house == BUST:
+        return "Both busted! House wins.", -1
+    if player == BUST:
+        return "Busted! House wins.", -1
+    if house == BUST:
+        return "Dealer busted! You win!", 1
+    if player == 21 and house == 21:
+        return "It's a tie!", 0  # both made 21 with more than 2 cards
+    if player == 21:
+        return "21! But not a natural blackjack.", 1
+    if house == 21:
+        return "House has 21! House wins.", -1
+    if player > house:
+        return "You win!", 1
+    if player == house:
+        return "It's a tie!", 0
+    return "House wins!", -1
+
+# Every (player, house) pairing resolved once up front, so settling a hand is a lookup
+OUTCOMES = [[settle(player, house) for house in range(NATURAL + 1)] for player in range(NATURAL + 1)]
+
+def table_odds(hand, upcard, deck_mode):
+    """Exact odds for a hand against the house upcard, given how this table deals.
+
+    Runs in the compute pool, so it only takes and returns plain data. The
+    hole card and every later draw come from the house deck, player draws from
+    the player deck, all with replacement like deal_card.
+    """
+    game = BlackjackGame()
+    game.deck_mode = deck_mode
+    decks = DECKS['normal'] if deck_mode == "normal" else DECKS['stacked']
+    player_cards = {card: decks['player'].count(card) / len(decks['player']) for card in set(decks['player'])}
+    house_cards = {card: decks['house'].count(card) / len(decks['house']) for card in set(decks['house'])}
+
+    finals = {}  # house hand code -> probability
+    def play_house(house, probability):
+        value = game.hand_value(house)
+        if value < 17 or (value == 17 and 11 in house):
+            for card, p in house_cards.items():
+                play_house(house + [card], probability * p)
+        else:
+            code = game.hand_code(house)
+            finals[code] = finals.get(code, 0) + probability
+    play_house([upcard], 1.0)
+
+    def stand_ev(cards):
+        row = OUTCOMES[game.hand_code(cards)]
+        return sum(p * row[code][1] for code, p in finals.items())
+
+    hand = list(hand)
+    hit_bust = sum(p for card, p in player_cards.items() if game.hand_value(hand + [card]) > 21)
+    return {
+        "house_bust": finals.get(BUST, 0.0),
+        "house_totals": {code: p for code, p in finals.items() if code != BUST},
+        "stand_ev": stand_ev(hand),
+        "hit_once_ev": sum(p * stand_ev(hand + [card]) for card, p in player_cards.items()),
+        "hit_bust": hit_bust,
+    }
+
 class BlackjackGame:
     def __init__(self):
         self.players = []
@@ -14,22 +102,24 @@ class BlackjackGame:
         self.house = []
         self.started = False
         self.turn_index = 0
-        self.pending_action = None
+        self.pending_actions = {}  # member id -> (member, action, hand index) awaiting dealer approval
         self.allow_double = True
         self.allow_split = True
         self.biased_starts = False  # Toggle for biased starting hands
+        self.simultaneous = False  # Everyone plays their hands at once instead of taking turns
+        self.round_timeout = 60  # Seconds before unfinished hands stand in simultaneous mode
+        self.deadline_task = None
+        self.deadline = None  # time.monotonic() at which a simultaneous round ends
+        self.finished = False
+
+    def apply_settings(self, settings):
+        """Copy a guild's default table rules onto this table."""
+        for rule in TABLE_RULES:
+            setattr(self, rule, settings[rule])
 
     def deal_card(self, who='player'):
-        if self.deck_mode == "normal":
-            deck = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
-            return random.choice(deck)
-        else:
-            if who == 'player':
-                deck = [2]*1 + [3]*1 + [4]*1 + [5]*2 + [6]*2 + [7]*2 + [8]*2 + [9]*2 + [10]*8 + [11]*1
-                return random.choice(deck)
-            else:
-                deck = [2]*5 + [3]*5 + [4]*5 + [5]*2 + [6]*2 + [7]*2 + [8]*1 + [9]*1 + [10]*2 + [11]*1
-                return random.choice(deck)
+        decks = DECKS['normal'] if self.deck_mode == "normal" else DECKS['stacked']
+        return random.choice(decks['player'] if who == 'player' else decks['house'])
 
     def hand_value(self, hand):
         total = sum(hand)
@@ -42,6 +132,15 @@ class BlackjackGame:
     def is_natural_blackjack(self, hand):
         return len(hand) == 2 and self.hand_value(hand) == 21
 
+    def hand_code(self, hand):
+        """Index of a hand in OUTCOMES."""
+        total = self.hand_value(hand)
+        if total > 21:
+            return BUST
+        if total == 21 and len(hand) == 2:
+            return NATURAL
+        return total
+
     def current_player(self):
         if self.turn_index < len(self.players):
             return self.players[self.turn_index]
@@ -54,6 +153,30 @@ class BlackjackGame:
     def all_hands_done(self, member):
         return len(self.stands[member.id]) == len(self.hands[member.id])
 
+    def all_players_done(self):
+        return all(self.all_hands_done(player) for player in self.players)
+
+    def can_act(self, member):
+        if self.simultaneous:
+            return member in self.players and not self.all_hands_done(member)
+        return member == self.current_player()
+
+    def cannot_act_message(self):
+        # There are no turns in simultaneous mode, only players with or without an open hand
+        return "You have no open hand this round." if self.simultaneous else "It's not your turn."
+
+    def awaiting_approval(self, member):
+        """Whether a pending dealer approval stops this member from acting."""
+        if not self.pending_actions:
+            return False
+        # In simultaneous mode a pending request only holds up the player who made it.
+        return not self.simultaneous or member.id in self.pending_actions
+
+    def seconds_left(self):
+        if self.deadline is None:
+            return None
+        return max(0, round(self.deadline - time.monotonic()))
+
     def generate_biased_start_hand(self):
         hands_12_17 = []
         for c1 in [2,3,4,5,6,7,8,9,10,11]:
@@ -66,10 +189,27 @@ class BlackjackGame:
         deck = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11]
         return [random.choice(deck), random.choice(deck)]
 
+def get_table(ctx):
+    """Return the channel's table, creating one with the guild's default rules."""
+    game = games.get(ctx.channel.id)
+    if game is None:
+        game = games[ctx.channel.id] = BlackjackGame()
+        if ctx.guild is not None:
+            game.apply_settings(guild_settings.all(ctx.guild.id))
+    return game
+
+def publish_table(channel_id, game, results=None):
+    hub.publish(f"blackjack:{channel_id}", blackjack_state(channel_id, game, results))
+
+async def publish_after_command(ctx):
+    game = games.get(ctx.channel.id)
+    if game is not None:
+        publish_table(ctx.channel.id, game)
+
 def setup_blackjack_commands(bot: commands.Bot):
     @bot.command()
     async def bj_join(ctx):
-        game = games.setdefault(ctx.channel.id, BlackjackGame())
+        game = get_table(ctx)
         if game.started:
             await ctx.send("Game already started! Wait for the next round.")
             return
@@ -99,9 +239,22 @@ def setup_blackjack_commands(bot: commands.Bot):
         game.house = [game.deal_card('house'), game.deal_card('house')]
         game.started = True
         game.turn_index = 0
-        game.pending_action = None
+        game.pending_actions = {}
+        if game.simultaneous:
+            game.deadline = time.monotonic() + game.round_timeout
+            game.deadline_task = asyncio.create_task(round_deadline(ctx, game))
         await ctx.send("Blackjack started!\n" + await display_state(ctx, game))
 
+    async def round_deadline(ctx, game):
+        await asyncio.sleep(game.round_timeout)
+        if game.finished:
+            return
+        for player in game.players:
+            game.stands[player.id].update(range(len(game.hands[player.id])))
+        game.pending_actions = {}
+        await ctx.send("Time's up! All remaining hands stand.")
+        await finish_game(ctx, game)
+
     async def display_state(ctx, game):
         msg = ""
         for player in game.players:
@@ -110,13 +263,15 @@ def setup_blackjack_commands(bot: commands.Bot):
             for i, hand in enumerate(hands):
                 total = game.hand_value(hand)
                 done = " (DONE)" if i in game.stands[player.id] else ""
-                marker = " ←" if (player == game.current_player() and i == game.active_hand[player.id]) else ""
+                acting = game.simultaneous or player == game.current_player()
+                marker = " ←" if (acting and i == game.active_hand[player.id] and not done) else ""
                 msg += f"  Hand {i+1}: {hand} (Total: {total}){done}{marker}\n"
         msg += f"House shows: [{game.house[0]}, ?]\n"
-        if game.pending_action:
-            p, action, _ = game.pending_action
+        for p, action, _ in game.pending_actions.values():
             msg += f"\nAwaiting dealer approval: {p.mention} requests **{action.upper()}**"
-        else:
+        if game.simultaneous:
+            msg += f"\nEveryone plays at once! {game.seconds_left()} seconds left. Type `!bj_hit`, `!bj_stand`, `!bj_double` or `!bj_split`."
+        elif not game.pending_actions:
             msg += f"{game.current_player().mention}, it's your turn! Type `!bj_hit`, `!bj_stand`, `!bj_double` or `!bj_split`."
         return msg
 
@@ -131,11 +286,11 @@ def setup_blackjack_commands(bot: commands.Bot):
     @bot.command()
     async def bj_hit(ctx):
         game = games.get(ctx.channel.id)
-        if not game or not game.started or game.pending_action:
+        if not game or not game.started or game.awaiting_approval(ctx.author):
             await ctx.send("Cannot hit right now. (Game not started, or waiting on dealer approval for another action.)")
             return
-        if ctx.author != game.current_player():
-            await ctx.send("It's not your turn.")
+        if not game.can_act(ctx.author):
+            await ctx.send(game.cannot_act_message())
             return
         hand = game.current_hand(ctx.author)
         idx = game.active_hand[ctx.author.id]
@@ -151,11 +306,11 @@ def setup_blackjack_commands(bot: commands.Bot):
     @bot.command()
     async def bj_stand(ctx):
         game = games.get(ctx.channel.id)
-        if not game or not game.started or game.pending_action:
+        if not game or not game.started or game.awaiting_approval(ctx.author):
             await ctx.send("Cannot stand right now. (Game not started, or waiting on dealer approval for another action.)")
             return
-        if ctx.author != game.current_player():
-            await ctx.send("It's not your turn.")
+        if not game.can_act(ctx.author):
+            await ctx.send(game.cannot_act_message())
             return
         idx = game.active_hand[ctx.author.id]
         game.stands[ctx.author.id].add(idx)
@@ -168,17 +323,17 @@ def setup_blackjack_commands(bot: commands.Bot):
         if not game or not game.started:
             await ctx.send("No active blackjack game. Start one with `!bj_start`.")
             return
-        if game.pending_action:
+        if game.awaiting_approval(ctx.author):
             await ctx.send("Another action is pending approval. Please wait.")
             return
-        if ctx.author != game.current_player():
-            await ctx.send("It's not your turn.")
+        if not game.can_act(ctx.author):
+            await ctx.send(game.cannot_act_message())
             return
         if not can_double(game, ctx.author):
             await ctx.send("Double down is not allowed, or not possible at this time.")
             return
         idx = game.active_hand[ctx.author.id]
-        game.pending_action = (ctx.author, "double", idx)
+        game.pending_actions[ctx.author.id] = (ctx.author, "double", idx)
         await ctx.send(f"{ctx.author.mention} requests DOUBLE DOWN on hand {idx+1}. Dealer must approve with `!bj_approve` or deny with `!bj_deny`.")
 
     @bot.command()
@@ -187,26 +342,39 @@ def setup_blackjack_commands(bot: commands.Bot):
         if not game or not game.started:
             await ctx.send("No active blackjack game. Start one with `!bj_start`.")
             return
-        if game.pending_action:
+        if game.awaiting_approval(ctx.author):
             await ctx.send("Another action is pending approval. Please wait.")
             return
-        if ctx.author != game.current_player():
-            await ctx.send("It's not your turn.")
+        if not game.can_act(ctx.author):
+            await ctx.send(game.cannot_act_message())
             return
         if not can_split(game, ctx.author):
             await ctx.send("Split is not allowed, or not possible at this time.")
             return
         idx = game.active_hand[ctx.author.id]
-        game.pending_action = (ctx.author, "split", idx)
+        game.pending_actions[ctx.author.id] = (ctx.author, "split", idx)
         await ctx.send(f"{ctx.author.mention} requests SPLIT on hand {idx+1}. Dealer must approve with `!bj_approve` or deny with `!bj_deny`.")
 
+    def take_pending(game, member):
+        """Remove and return the named player's pending request, or the oldest one."""
+        if not game or not game.started or not game.pending_actions:
+            return None
+        if member is None:
+            member_id = next(iter(game.pending_actions))
+        elif member.id in game.pending_actions:
+            member_id = member.id
+        else:
+            return None
+        return game.pending_actions.pop(member_id)
+
     @bot.command()
-    async def bj_approve(ctx):
+    async def bj_approve(ctx, member: discord.Member = None):
         game = games.get(ctx.channel.id)
-        if not game or not game.started or not game.pending_action:
+        pending = take_pending(game, member)
+        if not pending:
             await ctx.send("No action pending approval.")
             return
-        player, action, idx = game.pending_action
+        player, action, idx = pending
         if action == "double":
             hand = game.hands[player.id][idx]
             hand.append(game.deal_card('player'))
@@ -226,17 +394,16 @@ def setup_blackjack_commands(bot: commands.Bot):
             game.stands[player.id] = set()
             await ctx.send(f"{player.mention} split approved! Now playing hand {idx+1}: {game.hands[player.id][idx]}")
             await ctx.send(await display_state(ctx, game))
-        game.pending_action = None
 
     @bot.command()
-    async def bj_deny(ctx):
+    async def bj_deny(ctx, member: discord.Member = None):
         game = games.get(ctx.channel.id)
-        if not game or not game.started or not game.pending_action:
+        pending = take_pending(game, member)
+        if not pending:
             await ctx.send("No action pending approval.")
             return
-        player, action, idx = game.pending_action
+        player, action, idx = pending
         await ctx.send(f"{player.mention}, your {action.upper()} on hand {idx+1} was denied by the dealer.")
-        game.pending_action = None
 
     async def advance_hand_or_turn(ctx, game, member):
         hands = game.hands[member.id]
@@ -248,6 +415,13 @@ def setup_blackjack_commands(bot: commands.Bot):
                 await ctx.send(f"{member.mention}, now playing hand {next_idx+1}.")
                 await ctx.send(await display_state(ctx, game))
                 return
+        if game.simultaneous:
+            if game.all_players_done():
+                await finish_game(ctx, game)
+            else:
+                waiting = sum(1 for player in game.players if not game.all_hands_done(player))
+                await ctx.send(f"{member.mention} is done. Waiting on {waiting} more player(s).")
+            return
         if game.turn_index < len(game.players) - 1:
             game.turn_index += 1
             next_player = game.current_player()
@@ -257,47 +431,54 @@ def setup_blackjack_commands(bot: commands.Bot):
             await finish_game(ctx, game)
 
     async def finish_game(ctx, game):
+        if game.finished:
+            return
+        game.finished = True
+        if game.deadline_task and game.deadline_task is not asyncio.current_task():
+            game.deadline_task.cancel()
         house = game.house
         while game.hand_value(house) < 17 or (game.hand_value(house) == 17 and 11 in house):
             house.append(game.deal_card('house'))
         house_total = game.hand_value(house)
-        house_natural = game.is_natural_blackjack(house)
+        house_outcomes = [row[game.hand_code(house)] for row in OUTCOMES]
         result_msg = f"House hand: {house} (Total: {house_total})\n\n"
+        results = []
         for player in game.players:
             for i, hand in enumerate(game.hands[player.id]):
                 total = game.hand_value(hand)
-                player_natural = game.is_natural_blackjack(hand)
-                if player_natural and not house_natural:
-                    result = "Blackjack! (Natural) You win!"
-                elif house_natural and not player_natural:
-                    result = "House has blackjack! (Natural) House wins!"
-                elif player_natural and house_natural:
-                    result = "Both have blackjack! It's a tie!"
-                elif total > 21 and house_total > 21:
-                    result = "Both busted! House wins."
-                elif total > 21:
-                    result = "Busted! House wins."
-                elif house_total > 21:
-                    result = "Dealer busted! You win!"
-                elif total == 21 and house_total == 21:
-                    result = "It's a tie!"  # both made 21 with more than 2 cards
-                elif total == 21:
-                    result = "21! But not a natural blackjack."
-                elif house_total == 21:
-                    result = "House has 21! House wins."
-                elif total > house_total:
-                    result = "You win!"
-                elif total == house_total:
-                    result = "It's a tie!"
-                else:
-                    result = "House wins!"
+                result, _ = house_outcomes[game.hand_code(hand)]
                 result_msg += f"{player.mention}, Hand {i+1}: {hand} (Total: {total}) - **{result}**\n"
+                results.append({"name": player.name, "hand": i + 1, "result": result})
+        publish_table(ctx.channel.id, game, results)
         await ctx.send(result_msg)
-        del games[ctx.channel.id]
+        if games.get(ctx.channel.id) is game:
+            del games[ctx.channel.id]
+
+    @bot.command()
+    async def bj_odds(ctx):
+        game = games.get(ctx.channel.id)
+        if not game or not game.started or ctx.author not in game.players:
+            await ctx.send("You need a hand in a running game to ask for odds.")
+            return
+        hand = game.current_hand(ctx.author)
+        try:
+            odds = await compute_pool.run(table_odds, tuple(hand), game.house[0], game.deck_mode, timeout=5)
+        except ComputeQueueFull:
+            await ctx.send("The odds calculator is busy right now. Try again in a moment.")
+            return
+        except asyncio.TimeoutError:
+            await ctx.send("The odds calculation took too long.")
+            return
+        await ctx.send(
+            f"{ctx.author.mention}, your hand {hand} against the house {game.house[0]}:\n"
+            f"House busts {odds['house_bust']:.0%} of the time.\n"
+            f"Hitting busts you {odds['hit_bust']:.0%} of the time.\n"
+            f"Expected result: stand {odds['stand_ev']:+.2f} bets, hit once {odds['hit_once_ev']:+.2f} bets."
+        )
 
     @bot.command()
     async def bj_options(ctx, *args):
-        game = games.setdefault(ctx.channel.id, BlackjackGame())
+        game = get_table(ctx)
         msg = []
         args = list(args)
         if not args:
@@ -305,6 +486,7 @@ def setup_blackjack_commands(bot: commands.Bot):
             msg.append(f"Double allowed: **{game.allow_double}**")
             msg.append(f"Split allowed: **{game.allow_split}**")
             msg.append(f"Biased starts: **{game.biased_starts}**")
+            msg.append(f"Simultaneous play: **{game.simultaneous}** ({game.round_timeout}s per round)")
         else:
             for arg in args:
                 arg = arg.lower()
@@ -332,10 +514,39 @@ def setup_blackjack_commands(bot: commands.Bot):
                     elif val == 'off':
                         game.allow_split = False
                         msg.append("Split DISABLED.")
+                elif arg.startswith('simul:'):
+                    val = arg.split(':', 1)[1]
+                    if game.started:
+                        msg.append("Simultaneous play can only be changed before the round starts.")
+                    elif val == 'on':
+                        game.simultaneous = True
+                        msg.append("Simultaneous play ENABLED.")
+                    elif val == 'off':
+                        game.simultaneous = False
+                        msg.append("Simultaneous play DISABLED.")
+                elif arg.startswith('timeout:'):
+                    val = arg.split(':', 1)[1]
+                    if val.isdigit() and int(val) > 0:
+                        game.round_timeout = int(val)
+                        msg.append(f"Round timeout set to {game.round_timeout} seconds.")
+            if ctx.guild is not None and ctx.author.guild_permissions.manage_guild:
+                # Remember the rules as this server's defaults for future tables
+                guild_settings.update(ctx.guild.id, {rule: getattr(game, rule) for rule in TABLE_RULES})
+            elif ctx.guild is not None:
+                msg.append("These rules apply to this table only. Saving server defaults needs the Manage Server permission.")
         await ctx.send("\n".join(msg))
 
     @bot.command()
     async def bj_reset(ctx):
         if ctx.channel.id in games:
-            del games[ctx.channel.id]
+            game = games.pop(ctx.channel.id)
+            game.finished = True
+            if game.deadline_task:
+                game.deadline_task.cancel()
+        hub.publish(f"blackjack:{ctx.channel.id}", None)
         await ctx.send("Blackjack game reset.")
+
+    # Push the table's public state to spectators after every blackjack command
+    for command in bot.commands:
+        if command.name.startswith("bj_"):
+            command.after_invoke(publish_after_command)
@@ -0,0 +1,344 @@
+import math
+import bisect
+import asyncio
+import logging
+from discord.ext import commands
+from blackjack import BlackjackGame, OUTCOMES
+
+tournaments = {}  # guild id -> Tournament
+
+SEATS_PER_TABLE = 7
+
+
+class Tournament:
+    """A multi-table blackjack event: chip stacks, timed rounds and seat rebalancing."""
+
+    def __init__(self, host, starting_chips=1000, bet=100, round_seconds=45, max_rounds=20):
+        self.host = host
+        self.starting_chips = starting_chips
+        self.bet = bet
+        self.round_seconds = round_seconds
+        self.max_rounds = max_rounds
+        self.members = {}  # member id -> member
+        self.chips = {}  # member id -> chip count
+        self.standings = []  # (-chips, member id), kept sorted as chips change
+        self.channels = {}  # channel id -> channel used as a table
+        self.seating = {}  # channel id -> members seated there
+        self.tables = {}  # channel id -> BlackjackGame for the current round
+        self.round = 0
+        self.started = False
+        self.task = None
+        self.round_done = asyncio.Event()
+
+    def add_player(self, member):
+        self.members[member.id] = member
+        self.chips[member.id] = self.starting_chips
+        bisect.insort(self.standings, (-self.starting_chips, member.id))
+
+    def add_table(self, channel):
+        self.channels[channel.id] = channel
+        self.seating.setdefault(channel.id, [])
+
+    def capacity(self):
+        # Keeps every table's round message well under Discord's 2000 character limit
+        return len(self.channels) * SEATS_PER_TABLE
+
+    def apply_chips(self, deltas):
+        """Move each changed stack to its new place in the standings, leaving the rest alone."""
+        for member_id, delta in deltas.items():
+            if not delta:
+                continue
+            old = self.chips[member_id]
+            del self.standings[bisect.bisect_left(self.standings, (-old, member_id))]
+            self.chips[member_id] = old + delta
+            bisect.insort(self.standings, (-(old + delta), member_id))
+
+    def rank(self, member_id):
+        return bisect.bisect_left(self.standings, (-self.chips[member_id], member_id)) + 1
+
+    def active_players(self):
+        return [self.members[member_id] for _, member_id in self.standings if self.chips[member_id] >= self.bet]
+
+    def rebalance(self):
+        """Drop busted players, close surplus tables and even out the rest.
+
+        Returns channel id -> members who were newly seated there.
+        """
+        before = {member.id: channel_id for channel_id, seats in self.seating.items() for member in seats}
+        active = {member.id for member in self.active_players()}
+        for seats in self.seating.values():
+            seats[:] = [member for member in seats if member.id in active]
+        seated = {member.id for seats in self.seating.values() for member in seats}
+        unseated = [self.members[member_id] for member_id in active if member_id not in seated]
+
+        # Use as few tables as the field needs; break up the emptiest ones first.
+        needed = max(1, min(len(self.channels), math.ceil(len(active) / SEATS_PER_TABLE)))
+        by_size = sorted(self.seating, key=lambda channel_id: len(self.seating[channel_id]), reverse=True)
+        open_tables, closing = by_size[:needed], by_size[needed:]
+        for channel_id in closing:
+            unseated.extend(self.seating[channel_id])
+            self.seating[channel_id] = []
+        for member in unseated:
+            target = min(open_tables, key=lambda channel_id: len(self.seating[channel_id]))
+            self.seating[target].append(member)
+
+        while True:
+            largest = max(open_tables, key=lambda channel_id: len(self.seating[channel_id]))
+            smallest = min(open_tables, key=lambda channel_id: len(self.seating[channel_id]))
+            if len(self.seating[largest]) - len(self.seating[smallest]) <= 1:
+                break
+            self.seating[smallest].append(self.seating[largest].pop())
+
+        moves = {}
+        for channel_id, seats in self.seating.items():
+            arrivals = [member for member in seats if before.get(member.id) != channel_id]
+            if arrivals:
+                moves[channel_id] = arrivals
+        return moves
+
+    def table_of(self, member_id):
+        for channel_id, seats in self.seating.items():
+            if any(member.id == member_id for member in seats):
+                return channel_id
+        return None
+
+    def deal_round(self):
+        self.round += 1
+        self.round_done.clear()
+        self.tables = {}
+        for channel_id, seats in self.seating.items():
+            if not seats:
+                continue
+            game = BlackjackGame()
+            game.simultaneous = True
+            game.players = list(seats)
+            for member in seats:
+                game.hands[member.id] = [[game.deal_card('player'), game.deal_card('player')]]
+                game.stands[member.id] = set()
+                game.active_hand[member.id] = 0
+            game.house = [game.deal_card('house'), game.deal_card('house')]
+            game.started = True
+            self.tables[channel_id] = game
+
+    def hand_finished(self):
+        if all(game.all_players_done() for game in self.tables.values()):
+            self.round_done.set()
+
+    def settle_round(self):
+        """Play out every house, then resolve every hand of the round in one pass."""
+        deltas = {}
+        results = {}
+        for channel_id, game in self.tables.items():
+            house = game.house
+            while game.hand_value(house) < 17 or (game.hand_value(house) == 17 and 11 in house):
+                house.append(game.deal_card('house'))
+            house_code = game.hand_code(house)
+            lines = []
+            for member in game.players:
+                hand = game.hands[member.id][0]
+                result, payout = OUTCOMES[game.hand_code(hand)][house_code]
+                deltas[member.id] = int(payout * self.bet)
+                lines.append((member, hand, result))
+            results[channel_id] = (house, lines)
+            game.finished = True
+        self.apply_chips(deltas)
+        return results, deltas
+
+
+def setup_tournament_commands(bot: commands.Bot):
+    def get_tournament(ctx):
+        return tournaments.get(ctx.guild.id) if ctx.guild else None
+
+    async def announce_round(tournament):
+        sends = []
+        for channel_id, game in tournament.tables.items():
+            msg = f"**Tournament round {tournament.round}** (bet {tournament.bet})\n"
+            for member in game.players:
+                hand = game.hands[member.id][0]
+                msg += f"{member.mention} ({tournament.chips[member.id]} chips): {hand} (Total: {game.hand_value(hand)})\n"
+            msg += f"House shows: [{game.house[0]}, ?]\n"
+            msg += f"Everyone plays at once! `!bjt_hit` or `!bjt_stand` within {tournament.round_seconds} seconds."
+            sends.append(tournament.channels[channel_id].send(msg))
+        await asyncio.gather(*sends)
+
+    async def announce_results(tournament, results, deltas):
+        sends = []
+        for channel_id, (house, lines) in results.items():
+            game = tournament.tables[channel_id]
+            msg = f"House hand: {house} (Total: {game.hand_value(house)})\n\n"
+            for member, hand, result in lines:
+                change = deltas[member.id]
+                msg += (f"{member.mention}: {hand} (Total: {game.hand_value(hand)}) - **{result}** "
+                        f"{change:+d} → {tournament.chips[member.id]} chips (#{tournament.rank(member.id)})\n")
+            sends.append(tournament.channels[channel_id].send(msg))
+        await asyncio.gather(*sends)
+
+    async def run_tournament(guild_id, tournament):
+        try:
+            while tournament.round < tournament.max_rounds:
+                active = tournament.active_players()
+                if len(active) < 2:
+                    break
+                moves = tournament.rebalance()
+                await asyncio.gather(*(
+                    tournament.channels[channel_id].send(
+                        f"{', '.join(member.mention for member in arrivals)}: you are now seated at this table."
+                    )
+                    for channel_id, arrivals in moves.items()
+                ))
+                tournament.deal_round()
+                await announce_round(tournament)
+                try:
+                    await asyncio.wait_for(tournament.round_done.wait(), tournament.round_seconds)
+                except asyncio.TimeoutError:
+                    pass  # Hands that are still open simply stand
+                results, deltas = tournament.settle_round()
+                await announce_results(tournament, results, deltas)
+                for member_id, chips in tournament.chips.items():
+                    if deltas.get(member_id) and chips < tournament.bet:
+                        await tournament.channels[tournament.table_of(member_id)].send(
+                            f"{tournament.members[member_id].mention} is out of the tournament!"
+                        )
+            await finish_tournament(guild_id, tournament)
+        except Exception as e:
+            logging.error("Tournament in guild %s stopped: %s", guild_id, e)
+            tournaments.pop(guild_id, None)
+            for game in tournament.tables.values():
+                game.finished = True
+            await asyncio.gather(
+                *(channel.send("The tournament was stopped by an error. The host can start a new one with `!bjt_create`.")
+                  for channel in tournament.channels.values()),
+                return_exceptions=True
+            )
+
+    async def finish_tournament(guild_id, tournament):
+        tournaments.pop(guild_id, None)
+        msg = "**Tournament over!** Final standings:\n" + standings_text(tournament, 10)
+        await asyncio.gather(*(channel.send(msg) for channel in tournament.channels.values()))
+
+    def standings_text(tournament, limit):
+        lines = []
+        for place, (neg_chips, member_id) in enumerate(tournament.standings[:limit], start=1):
+            lines.append(f"{place}. {tournament.members[member_id].mention}: {-neg_chips} chips")
+        return "\n".join(lines)
+
+    @bot.command()
+    async def bjt_create(ctx, chips: int = 1000, bet: int = 100, seconds: int = 45, rounds: int = 20):
+        if ctx.guild is None:
+            await ctx.send("Tournaments can only be run in a server.")
+            return
+        if get_tournament(ctx):
+            await ctx.send("A tournament is already running in this server.")
+            return
+        if min(chips, bet, seconds, rounds) <= 0 or bet > chips:
+            await ctx.send("Chips, bet, seconds and rounds must be positive, and the bet can't exceed the starting chips.")
+            return
+        tournament = tournaments[ctx.guild.id] = Tournament(ctx.author, chips, bet, seconds, rounds)
+        tournament.add_table(ctx.channel)
+        await ctx.send(
+            f"{ctx.author.mention} created a blackjack tournament: {chips} chips, {bet} per hand, "
+            f"{seconds}s rounds, {rounds} rounds. Join with `!bjt_join`; add more tables with `!bjt_table`."
+        )
+
+    @bot.command()
+    async def bjt_table(ctx):
+        tournament = get_tournament(ctx)
+        if not tournament or ctx.author != tournament.host:
+            await ctx.send("Only the tournament host can add tables.")
+            return
+        if ctx.channel.id in tournament.channels:
+            await ctx.send("This channel is already a tournament table.")
+            return
+        tournament.add_table(ctx.channel)
+        await ctx.send(f"This channel is now tournament table {len(tournament.channels)}.")
+
+    @bot.command()
+    async def bjt_join(ctx):
+        tournament = get_tournament(ctx)
+        if not tournament:
+            await ctx.send("No tournament to join. Create one with `!bjt_create`.")
+            return
+        if tournament.started:
+            await ctx.send("The tournament has already started.")
+            return
+        if ctx.author.id in tournament.members:
+            await ctx.send(f"{ctx.author.mention}, you are already registered.")
+            return
+        if len(tournament.members) >= tournament.capacity():
+            await ctx.send(
+                f"The tournament is full ({tournament.capacity()} seats on {len(tournament.channels)} table(s)). "
+                f"The host can add a table with `!bjt_table`."
+            )
+            return
+        tournament.add_player(ctx.author)
+        await ctx.send(f"{ctx.author.mention} joined the tournament! ({len(tournament.members)} players)")
+
+    @bot.command()
+    async def bjt_start(ctx):
+        tournament = get_tournament(ctx)
+        if not tournament or ctx.author != tournament.host:
+            await ctx.send("Only the tournament host can start it.")
+            return
+        if tournament.started:
+            await ctx.send("The tournament has already started.")
+            return
+        if len(tournament.members) < 2:
+            await ctx.send("Need at least 2 players to start a tournament.")
+            return
+        if len(tournament.members) > tournament.capacity():
+            await ctx.send(f"{len(tournament.members)} players need more than {len(tournament.channels)} table(s). Add one with `!bjt_table`.")
+            return
+        tournament.started = True
+        await ctx.send(f"Tournament starting with {len(tournament.members)} players on {len(tournament.channels)} table(s)!")
+        tournament.task = asyncio.create_task(run_tournament(ctx.guild.id, tournament))
+
+    async def play(ctx, hit):
+        tournament = get_tournament(ctx)
+        game = tournament.tables.get(ctx.channel.id) if tournament else None
+        if not game or game.finished:
+            await ctx.send("No tournament hand is being played at this table.")
+            return
+        if not game.can_act(ctx.author):
+            await ctx.send("You have no open hand at this table.")
+            return
+        hand = game.hands[ctx.author.id][0]
+        if hit:
+            hand.append(game.deal_card('player'))
+            total = game.hand_value(hand)
+            if total <= 21:
+                await ctx.send(f"{ctx.author.mention}: {hand} (Total: {total})")
+                return
+            await ctx.send(f"{ctx.author.mention} busted! {hand} (Total: {total})")
+        else:
+            await ctx.send(f"{ctx.author.mention} stands on {game.hand_value(hand)}.")
+        game.stands[ctx.author.id].add(0)
+        tournament.hand_finished()
+
+    @bot.command()
+    async def bjt_hit(ctx):
+        await play(ctx, hit=True)
+
+    @bot.command()
+    async def bjt_stand(ctx):
+        await play(ctx, hit=False)
+
+    @bot.command()
+    async def bjt_standings(ctx):
+        tournament = get_tournament(ctx)
+        if not tournament:
+            await ctx.send("No tournament is running.")
+            return
+        msg = f"Standings after round {tournament.round}:\n" + standings_text(tournament, 10)
+        if ctx.author.id in tournament.members:
+            msg += f"\n\nYou are #{tournament.rank(ctx.author.id)} with {tournament.chips[ctx.author.id]} chips."
+        await ctx.send(msg)
+
+    @bot.command()
+    async def bjt_end(ctx):
+        tournament = get_tournament(ctx)
+        if not tournament or ctx.author != tournament.host:
+            await ctx.send("Only the tournament host can end it.")
+            return
+        if tournament.task:
+            tournament.task.cancel()
+        await finish_tournament(ctx.guild.id, tournament)
@@ -2,19 +2,45 @@ import os
 import asyncio
 import logging
 import discord
+from collections import Counter
 from bot_instance import bot  # Import the shared bot instance
 from health_check import start_health_check_server
+from loop_watchdog import LoopWatchdog
+from utils.backoff import JitteredBackoff
+from utils.settings import guild_settings, coerce
+from utils.log import setup_logging, parse_sampling, bind_context
+from utils.ratelimit import command_limiter
+from utils.compute import compute_pool, ComputeQueueFull
+from runtime_profile import install_profile, PayloadRecorder
 from game.game_manager import game_manager  # Import the GameManager
 from game.player import Player  # Import the Player class
+from game.interactions import router
+from game.balance import simulate_batch, OUTCOMES
+from game.constants import MIN_PLAYERS, MAX_PLAYERS
+from spectator import hub, mafia_state
 
 from blackjack import setup_blackjack_commands
+from blackjack_tournament import setup_tournament_commands
 setup_blackjack_commands(bot)
+setup_tournament_commands(bot)
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+setup_logging(
+    level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO),
+    sampling=parse_sampling(os.getenv("LOG_SAMPLING"))  # e.g. "discord=0.1,game=0.5"
+)
 discord_logger = logging.getLogger("discord")
 discord_logger.setLevel(logging.WARNING)
 
+reconnect_backoff = JitteredBackoff()
+
+if os.getenv("RECORD_GATEWAY_PAYLOADS"):
+    # Capture raw gateway traffic for benchmarks/runtime_profile.py
+    bot.add_listener(PayloadRecorder(os.getenv("RECORD_GATEWAY_PAYLOADS")).on_socket_raw_receive, "on_socket_raw_receive")
+
+# One listener routes every game component interaction by its custom_id
+bot.add_listener(router.on_interaction, "on_interaction")
+
 @bot.command()
 async def join(ctx):
     if game_manager.game_started:
@@ -71,6 +97,7 @@ async def reset(ctx):
     game_manager.host = None
     game_manager.game_started = False
     game_manager.night_kills = []
+    game_manager.end_session()
     await ctx.send("The game has been reset.")
 
 @bot.command()
@@ -95,41 +122,195 @@ async def party(ctx):
     player_list = "\n".join([f"{player.user.mention}" for player in game_manager.players])
     await ctx.send(f"Current players in the game:\n{player_list}")
 
+BALANCE_MAX_GAMES = 50000
+BALANCE_CHUNK = 5000  # Games per compute job, so quick jobs like bj_odds get a worker in between
+
+async def simulate_in_chunks(players, games, timeout):
+    """Run a balance simulation as a series of small compute jobs and add up the results."""
+    slots = asyncio.Semaphore(compute_pool.workers)
+
+    async def run_chunk(index, size):
+        async with slots:
+            # A fixed seed per chunk lets repeated questions come straight from the result cache.
+            seed = hash((players, index)) & 0xFFFFFFFF
+            return await compute_pool.run(simulate_batch, players, None, "heuristic", size, seed, timeout=timeout)
+
+    tasks = [
+        asyncio.ensure_future(run_chunk(index, min(BALANCE_CHUNK, games - start)))
+        for index, start in enumerate(range(0, games, BALANCE_CHUNK))
+    ]
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+    finally:
+        for task in tasks:
+            task.cancel()  # Chunks that haven't reached a worker yet are dropped
+    return sum(results, Counter())
+
+@bot.command()
+async def balance(ctx, players: int = 0, games: int = 20000):
+    players = players or max(len(game_manager.players), MIN_PLAYERS)
+    if not MIN_PLAYERS <= players <= MAX_PLAYERS or not 1 <= games <= BALANCE_MAX_GAMES:
+        await ctx.send(f"Pick {MIN_PLAYERS}-{MAX_PLAYERS} players and at most {BALANCE_MAX_GAMES} games.")
+        return
+
+    await ctx.send(f"Simulating {games} games with {players} players...")
+    try:
+        results = await simulate_in_chunks(players, games, timeout=60)
+    except ComputeQueueFull:
+        await ctx.send("The simulator is busy right now. Try again in a moment.")
+        return
+    except asyncio.TimeoutError:
+        await ctx.send("The simulation took too long. Try fewer games.")
+        return
+    rates = ", ".join(f"{outcome} {results[outcome] / games:.1%}" for outcome in OUTCOMES)
+    await ctx.send(f"With {players} players and the usual random role draw: {rates}")
+
+async def publish_mafia(ctx):
+    hub.publish("mafia", mafia_state(game_manager))
+
+# Push the lobby and game state to spectators after every command that changes it
+for command_name in ("join", "leave", "start", "reset", "kick"):
+    bot.get_command(command_name).after_invoke(publish_mafia)
+
+@bot.command()
+async def settings(ctx, key=None, *, value=None):
+    if ctx.guild is None:
+        await ctx.send("Settings can only be used in a server.")
+        return
+
+    if key is None:
+        current = guild_settings.all(ctx.guild.id)
+        lines = "\n".join(f"`{name}`: **{setting}**" for name, setting in current.items())
+        await ctx.send(f"Settings for this server:\n{lines}")
+        return
+
+    if value is None:
+        try:
+            await ctx.send(f"`{key}`: **{guild_settings.get(ctx.guild.id, key)}**")
+        except KeyError:
+            await ctx.send(f"Unknown setting `{key}`.")
+        return
+
+    if not ctx.author.guild_permissions.manage_guild:
+        await ctx.send("You need the Manage Server permission to change settings.")
+        return
+
+    try:
+        value = coerce(key, value)
+    except ValueError as e:
+        await ctx.send(str(e))
+        return
+    guild_settings.set(ctx.guild.id, key, value)
+    await ctx.send(f"`{key}` is now **{value}**.")
+
+@bot.event
+async def on_message(message):
+    if message.author.bot:
+        return
+    ctx = await bot.get_context(message)
+    if ctx.command is None:
+        return
+    # Shed excess invocations before they do any work or send anything
+    allowed, scope = command_limiter.allow(ctx.command.name, message.author.id, message.channel.id)
+    if not allowed:
+        if command_limiter.should_notify(message.author.id):
+            who = "this channel is" if scope == "channel" else "you are"
+            await ctx.send(f"{message.author.mention}, {who} using `{ctx.command.name}` too quickly. Please slow down.")
+        return
+    await bot.invoke(ctx)
+
+@bot.before_invoke
+async def attach_log_context(ctx):
+    # Each command runs in its own task, so this context stays with this invocation.
+    bind_context(
+        command=ctx.command.qualified_name,
+        guild=ctx.guild.id if ctx.guild else None,
+        channel=ctx.channel.id,
+        user=ctx.author.id
+    )
+
 @bot.event
 async def on_ready():
+    reconnect_backoff.reset()
     try:
-        logging.info(f"Logged in as {bot.user}")
-        logging.info(f"Registered Commands: {[command.name for command in bot.commands]}")
+        logging.info("Logged in as %s", bot.user)
+        logging.info("Registered Commands: %s", [command.name for command in bot.commands])
     except Exception as e:
-        logging.error(f"Error in on_ready: {e}")
+        logging.error("Error in on_ready: %s", e)
+
+@bot.event
+async def on_resumed():
+    reconnect_backoff.reset()
+    logging.info("Gateway session resumed.")
+
+async def reopen_bot():
+    """Reopen a closed bot without calling bot.clear(), which would drop the view store."""
+    bot._closing_task = None
+    bot.http.clear()
+    # close() sets bot.loop to MISSING and login() only restores it on the very first
+    # login, so rebind the loop and the ready event here. Without this the next gateway
+    # connection gets no loop and its heartbeat thread dies on the first beat.
+    await bot._async_setup_hook()
+    if bot.loop is not asyncio.get_running_loop():
+        raise RuntimeError("Reopening the bot did not restore its event loop.")
 
 async def run_bot_forever():
     TOKEN = os.getenv("BOT_TOKEN")
     if not TOKEN:
         raise ValueError("BOT_TOKEN environment variable is not set.")
+    needs_login = True
     while True:
         try:
-            logging.info("Starting bot...")
-            await bot.start(TOKEN)
+            if bot.is_closed():
+                await reopen_bot()
+                needs_login = True
+            if needs_login:
+                logging.info("Logging in...")
+                await bot.login(TOKEN)
+                needs_login = False
+            logging.info("Connecting to the gateway...")
+            # With reconnect=True discord.py resumes the session itself on transient drops;
+            # we only get here when the connection was closed for good.
+            await bot.connect(reconnect=True)
+            reason = "connection closed"
+        except (discord.LoginFailure, discord.PrivilegedIntentsRequired):
+            raise
         except Exception as e:
-            logging.error(f"Bot crashed with error: {e}. Restarting in 5 seconds...")
-            await asyncio.sleep(5)
+            reason = e
+        delay = reconnect_backoff.delay()
+        logging.error("Bot connection lost: %s. Reconnecting in %.2f seconds...", reason, delay)
+        await asyncio.sleep(delay)
 
-async def run_health_check():
+async def run_health_check(watchdog):
     logging.info("Starting health check server...")
-    runner, site = await start_health_check_server()
+    runner, site = await start_health_check_server(watchdog)
     logging.info("Health check server running. Blocking forever...")
     await asyncio.Event().wait()  # Block forever
 
 async def main():
     logging.info("Main starting. Running bot and health check concurrently.")
-    await asyncio.gather(
-        run_bot_forever(),
-        run_health_check()
+    await guild_settings.load()
+    compute_pool.start()
+    watchdog = LoopWatchdog(
+        asyncio.get_running_loop(),
+        stall_threshold=float(os.getenv("LOOP_STALL_THRESHOLD", "1.0")),
+        unhealthy_after=int(os.getenv("LOOP_STALLS_UNHEALTHY", "3")),
+        cooldown=float(os.getenv("LOOP_UNHEALTHY_COOLDOWN", "30"))
     )
+    watchdog.start()
+    try:
+        await asyncio.gather(
+            run_bot_forever(),
+            run_health_check(watchdog)
+        )
+    finally:
+        watchdog.stop()
     logging.info("Main exited! This should never happen unless both tasks stopped.")
 
 if __name__ == "__main__":
     print("Launching async main()...")
+    # Opt in to uvloop and orjson with BOT_RUNTIME_PROFILE=fast; must happen before the loop exists
+    runtime = install_profile()
+    logging.info("Runtime profile %s: %s event loop, %s codec.", runtime["profile"], runtime["event_loop"], runtime["json"])
     asyncio.run(main())
     print("asyncio.run(main()) exited! This should never print!")
@@ -1,5 +1,7 @@
+import os
 from discord.ext import commands
 import discord
+from utils.settings import guild_settings
 
 # Define intents
 intents = discord.Intents.default()
@@ -9,5 +11,15 @@ intents.message_content = True
 intents.presences = False
 intents.typing = False
 
+def get_prefix(bot, message):
+    """Look up the guild's prefix from the settings cache."""
+    if message.guild is None:
+        return guild_settings.get(None, "prefix")
+    return guild_settings.get(message.guild.id, "prefix")
+
 # Create the bot instance
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = commands.Bot(
+    command_prefix=get_prefix,
+    intents=intents,
+    enable_debug_events=bool(os.getenv("RECORD_GATEWAY_PAYLOADS"))  # Needed for on_socket_raw_receive
+)
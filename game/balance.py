@@ -0,0 +1,300 @@
+"""Offline Monte Carlo balance analyzer for Mafia role lineups.
+
+Plays headless games with the bot's own role classes and win conditions and
+reports how often each faction wins. Run it with:
+
+    python -m game.balance --games 200000
+    python -m game.balance --lineup "Mafia*2,Doctor,Detective,Villager*4"
+"""
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from game.constants import MIN_PLAYERS, MAX_PLAYERS
+from game.player import Player
+from game.roles import ROLES, Mafia, Doctor, Detective, Bodyguard, SerialKiller, Vigilante
+from game.win_conditions import WinConditions
+
+# Maps the messages returned by WinConditions.check_win to a faction
+FACTIONS = {
+    "Jester has won the game by being lynched!": "Jester",
+    "Mafia has won the game!": "Mafia",
+    "Town has won the game!": "Town",
+}
+DRAW = "Draw"
+OUTCOMES = ["Town", "Mafia", "Jester", DRAW]
+
+# Only the abilities that decide who dies are simulated; other roles play as villagers.
+KILLERS = (SerialKiller, Vigilante)
+PROTECTORS = (Doctor, Bodyguard)
+
+ROLE_CLASSES = {type(role).__name__: type(role) for role in ROLES}
+
+
+class HeadlessUser:
+    """Stands in for a discord user so Player and the role classes work unchanged."""
+
+    __slots__ = ("id", "name")
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"Player {user_id}"
+
+
+class RandomPolicy:
+    """Every choice is made uniformly at random."""
+
+    name = "random"
+
+    def night_target(self, actor, targets, game, rng):
+        return rng.choice(targets)
+
+    def vote(self, voter, candidates, game, rng):
+        return rng.choice(candidates)
+
+
+class HeuristicPolicy(RandomPolicy):
+    """Simple informed play: Mafia coordinate, the Detective shares results, town follows them."""
+
+    name = "heuristic"
+
+    def night_target(self, actor, targets, game, rng):
+        if isinstance(actor.role, Mafia):
+            # Silence whoever is going around accusing the Mafia.
+            exposed = [p for p in targets if p is game.revealed_detective]
+            return exposed[0] if exposed else rng.choice(targets)
+        if isinstance(actor.role, PROTECTORS) and game.revealed_detective in targets:
+            return game.revealed_detective
+        if isinstance(actor.role, (Detective, Vigilante)):
+            unknown = [p for p in targets if p not in game.cleared and p is not actor]
+            if isinstance(actor.role, Vigilante):
+                unknown = [p for p in unknown if p in game.known_mafia] or unknown
+            return rng.choice(unknown or targets)
+        return rng.choice(targets)
+
+    def vote(self, voter, candidates, game, rng):
+        if isinstance(voter.role, Mafia):
+            town = [p for p in candidates if not isinstance(p.role, Mafia)]
+            return rng.choice(town or candidates)
+        suspects = [p for p in candidates if p in game.known_mafia]
+        if suspects:
+            return suspects[0]
+        unknown = [p for p in candidates if p not in game.cleared]
+        return rng.choice(unknown or candidates)
+
+
+POLICIES = {policy.name: policy for policy in (RandomPolicy, HeuristicPolicy)}
+
+
+class SimulatedGame:
+    """A single headless game of Mafia."""
+
+    def __init__(self, role_classes, policy, rng):
+        self.policy = policy
+        self.rng = rng
+        self.players = [Player(HeadlessUser(i)) for i in range(len(role_classes))]
+        for player, role_class in zip(self.players, role_classes):
+            player.role = role_class()
+        self.win_conditions = WinConditions(self.players)
+        self.known_mafia = set()  # Mafia exposed by the Detective
+        self.cleared = set()  # Players the Detective found innocent
+        self.revealed_detective = None
+
+    def alive(self):
+        return [p for p in self.players if p.alive]
+
+    def play(self, max_days):
+        for _ in range(max_days):
+            self.night()
+            result = self.win_conditions.check_win()
+            if result:
+                return FACTIONS[result]
+            self.day()
+            result = self.win_conditions.check_win()
+            if result:
+                return FACTIONS[result]
+        return DRAW
+
+    def choose(self, actor):
+        targets = actor.role.valid_targets(self.players)
+        if not targets:
+            return None
+        target = self.policy.night_target(actor, targets, self, self.rng)
+        actor.role.previous_target = target
+        return target
+
+    def night(self):
+        alive = self.alive()
+        kills = []
+        protected = set()
+
+        mafia = [p for p in alive if isinstance(p.role, Mafia)]
+        if mafia:
+            # The Mafia share a single kill each night.
+            target = self.choose(self.rng.choice(mafia))
+            if target:
+                kills.append(target)
+
+        for player in alive:
+            role = player.role
+            if isinstance(role, KILLERS):
+                target = self.choose(player)
+                if target:
+                    kills.append(target)
+            elif isinstance(role, PROTECTORS):
+                target = self.choose(player)
+                if target:
+                    protected.add(target)
+            elif isinstance(role, Detective):
+                target = self.choose(player)
+                if target:
+                    if isinstance(target.role, Mafia):
+                        self.known_mafia.add(target)
+                    else:
+                        self.cleared.add(target)
+                    self.revealed_detective = player
+
+        for target in kills:
+            if target not in protected:
+                target.alive = False
+
+    def day(self):
+        alive = self.alive()
+        votes = Counter()
+        for voter in alive:
+            candidates = [p for p in alive if p is not voter]
+            if candidates:
+                votes[self.policy.vote(voter, candidates, self, self.rng)] += 1
+        if not votes:
+            return
+
+        # Same rule as DayPhase.tally_votes: a tie for the most votes lynches nobody.
+        max_votes = max(votes.values())
+        lynched = [player for player, count in votes.items() if count == max_votes]
+        if len(lynched) == 1:
+            lynched[0].alive = False
+
+
+def parse_lineup(spec):
+    """Turn "Mafia*2,Doctor,Villager*3" into a list of role classes."""
+    role_classes = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, count = item.partition("*")
+        if name not in ROLE_CLASSES:
+            raise ValueError(f"Unknown role {name!r}. Choose from: {', '.join(sorted(ROLE_CLASSES))}")
+        role_classes.extend([ROLE_CLASSES[name]] * int(count or 1))
+    return role_classes
+
+
+def lineup_label(role_classes):
+    counts = Counter(cls.__name__ for cls in role_classes)
+    return ",".join(f"{name}*{count}" if count > 1 else name for name, count in sorted(counts.items()))
+
+
+def simulate_batch(player_count, lineup, policy_name, games, seed):
+    """Play a batch of games and return a Counter of winning factions.
+
+    If lineup is None each game draws its roles the way GameManager.assign_roles
+    does: shuffle the role list and deal it out in order.
+    """
+    rng = random.Random(seed)
+    policy = POLICIES[policy_name]()
+    results = Counter()
+    if lineup is not None:
+        role_classes = [ROLE_CLASSES[name] for name in lineup]
+    deck = list(ROLE_CLASSES.values())
+    max_days = player_count * 2
+    for _ in range(games):
+        if lineup is None:
+            rng.shuffle(deck)
+            dealt = [deck[i % len(deck)] for i in range(player_count)]
+        else:
+            dealt = role_classes[:]
+            rng.shuffle(dealt)
+        results[SimulatedGame(dealt, policy, rng).play(max_days)] += 1
+    return results
+
+
+def run_analysis(scenarios, policy_name, games, workers=None, chunk_size=5000, seed=None):
+    """Spread every scenario over a process pool.
+
+    scenarios is a list of (player_count, lineup) pairs, where lineup is a list
+    of role class names or None for the bot's random draw. Returns a dict of
+    scenario -> Counter.
+    """
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    totals = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for index, (player_count, lineup) in enumerate(scenarios):
+            key = (player_count, tuple(lineup) if lineup else None)
+            totals[key] = Counter()
+            remaining = games
+            chunk = 0
+            while remaining > 0:
+                size = min(chunk_size, remaining)
+                chunk_seed = hash((seed, index, chunk)) & 0xFFFFFFFF
+                futures.append((key, pool.submit(simulate_batch, player_count, lineup, policy_name, size, chunk_seed)))
+                remaining -= size
+                chunk += 1
+        for key, future in futures:
+            totals[key].update(future.result())
+    return totals
+
+
+def format_report(totals):
+    header = f"{'Players':>7}  {'Lineup':<48}  {'Games':>9}  " + "  ".join(f"{o:>7}" for o in OUTCOMES)
+    lines = [header, "-" * len(header)]
+    for (player_count, lineup), counts in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1] or ())):
+        played = sum(counts.values())
+        label = "random draw (as in the bot)" if lineup is None else lineup_label([ROLE_CLASSES[n] for n in lineup])
+        rates = "  ".join(f"{100 * counts[o] / played:>6.2f}%" for o in OUTCOMES)
+        lines.append(f"{player_count:>7}  {label:<48}  {played:>9}  {rates}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate faction win rates for Mafia role lineups.")
+    parser.add_argument("--games", type=int, default=100000, help="games per player count or lineup")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="heuristic")
+    parser.add_argument("--lineup", action="append", default=[],
+                        help='explicit lineup such as "Mafia*2,Doctor,Villager*3" (repeatable)')
+    parser.add_argument("--min-players", type=int, default=MIN_PLAYERS)
+    parser.add_argument("--max-players", type=int, default=MAX_PLAYERS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print raw counts as JSON")
+    args = parser.parse_args()
+
+    if args.lineup:
+        scenarios = []
+        for spec in args.lineup:
+            role_classes = parse_lineup(spec)
+            scenarios.append((len(role_classes), [cls.__name__ for cls in role_classes]))
+    else:
+        scenarios = [(n, None) for n in range(args.min_players, args.max_players + 1)]
+
+    started = time.perf_counter()
+    totals = run_analysis(scenarios, args.policy, args.games, workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps([
+            {"players": n, "lineup": list(lineup) if lineup else None, "results": dict(counts)}
+            for (n, lineup), counts in totals.items()
+        ], indent=2))
+    else:
+        print(format_report(totals))
+        played = sum(sum(counts.values()) for counts in totals.values())
+        print(f"\n{played} games with the {args.policy} policy in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Game constants shared by the bot and offline tools
+MIN_PLAYERS = 4  # Minimum number of players to start a game
+MAX_PLAYERS = 20  # Maximum number of players per game
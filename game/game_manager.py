@@ -1,6 +1,7 @@
 from bot_instance import bot  # Import the shared bot instance
 import logging
 import asyncio
+import secrets
 from aiohttp import web  # For health-check server
 from random import shuffle
 from game.night_actions import NightActions
@@ -12,12 +13,8 @@ from game.roles import (
 )
 from game.phases import NightPhase
 from game.win_conditions import WinConditions
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-
-# Constants
-MAX_PLAYERS = 20  # Maximum number of players per game
+from game.constants import MIN_PLAYERS, MAX_PLAYERS
+from utils.log import bind_context
 
 class GameManager:
     def __init__(self):
@@ -28,20 +25,37 @@ class GameManager:
         self.win_conditions = WinConditions(self.players)
         self.game_started = False  # To prevent joins/leaves after game starts
         self.night_kills = []  # Stores nightly kills for updates
+        self.session_id = None  # Identifies this game in component custom_ids
+        self.night_number = 0
+
+    def get_alive_players(self):
+        return [player for player in self.players if player.alive]
 
     async def start_game(self, channel, user):
         """Start the game."""
-        if len(self.players) < 4:
-            await channel.send("Not enough players to start the game. At least 4 players are required.")
+        if len(self.players) < MIN_PLAYERS:
+            await channel.send(f"Not enough players to start the game. At least {MIN_PLAYERS} players are required.")
             return
 
         self.game_started = True
+        self.session_id = secrets.token_hex(4)
+        self.night_number = 0
+        self.night_actions.open_session(self.session_id)
+        bind_context(session=self.session_id)
+        logging.info("Mafia game started with %d players.", len(self.players))
         await channel.send(f"{user.mention} has started the game!")
         await self.assign_roles()
         await channel.send("Roles have been assigned. The game is now starting!")
         self.phase = NightPhase(channel, self.players)
         await self.phase.start()
     
+    def end_session(self):
+        """Stop routing interactions to the current game."""
+        if self.session_id:
+            self.night_actions.close_session(self.session_id)
+        self.session_id = None
+        self.night_number = 0
+
     async def assign_roles(self):
         """Assign roles to players."""
         shuffle(ROLES)
@@ -0,0 +1,51 @@
+import logging
+import discord
+
+
+class InteractionRouter:
+    """Dispatch component interactions to game sessions using their custom_id.
+
+    Custom ids look like "<kind>:<session>:<args...>", e.g.
+    "night:3f9a1c2e:2:123456789" for a night-action dropdown. Routing is a
+    single dict lookup on (kind, session), so no per-prompt View has to be
+    kept alive in the client's view store.
+    """
+
+    def __init__(self):
+        self._handlers = {}  # (kind, session_id) -> coroutine handler
+        self._kinds = set()
+
+    def claim(self, kind):
+        """Answer every interaction of this kind, even for sessions that no longer exist."""
+        self._kinds.add(kind)
+
+    def register(self, kind, session_id, handler):
+        self._kinds.add(kind)
+        self._handlers[(kind, session_id)] = handler
+
+    def unregister(self, kind, session_id):
+        self._handlers.pop((kind, session_id), None)
+
+    @staticmethod
+    def custom_id(kind, session_id, *args):
+        return ":".join([kind, session_id, *map(str, args)])
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        if interaction.type is not discord.InteractionType.component:
+            return
+        kind, _, rest = (interaction.data or {}).get("custom_id", "").partition(":")
+        if kind not in self._kinds:
+            return  # Not one of ours
+        session_id, _, args = rest.partition(":")
+        handler = self._handlers.get((kind, session_id))
+        if handler is None:
+            await interaction.response.send_message("This prompt has expired.")
+            return
+        try:
+            await handler(interaction, args.split(":") if args else [])
+        except Exception as e:
+            logging.error("Error handling interaction %s: %s", interaction.data.get("custom_id"), e)
+
+
+# Shared router, hooked up to the bot's on_interaction event in bot.py
+router = InteractionRouter()
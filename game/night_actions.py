@@ -1,15 +1,27 @@
 import discord
 from discord.ext import commands
 from discord.ui import Select, View
+from game.interactions import router
+
+NIGHT_ACTION = "night"  # custom_id kind for night-action dropdowns
 
 
 class NightActions(commands.Cog):
     def __init__(self, bot, game_manager):
         self.bot = bot
         self.game_manager = game_manager
+        router.claim(NIGHT_ACTION)
+
+    def open_session(self, session_id):
+        """Start routing night-action selections for a new game."""
+        router.register(NIGHT_ACTION, session_id, self.handle_selection)
+
+    def close_session(self, session_id):
+        router.unregister(NIGHT_ACTION, session_id)
 
     async def start_night_phase(self):
         """Start the night phase and prompt roles with night actions."""
+        self.game_manager.night_number += 1
         for player in self.game_manager.players:
             if player.role.has_night_action:
                 await self.prompt_night_action(player)
@@ -29,27 +41,42 @@ class NightActions(commands.Cog):
             await player.user.send("You have no valid targets for your action tonight.")
             return
 
-        # Create and send the dropdown
-        select = Select(placeholder="Select a target", options=options)
-        view = View()
+        # The custom_id carries everything needed to route the selection back to this
+        # game, so the view is stopped before sending and never kept in the view store.
+        custom_id = router.custom_id(
+            NIGHT_ACTION, self.game_manager.session_id, self.game_manager.night_number, player.user.id
+        )
+        select = Select(custom_id=custom_id, placeholder="Select a target", options=options)
+        view = View(timeout=None)
         view.add_item(select)
+        view.stop()
+        await player.user.send("Choose your target for tonight:", view=view)
 
-        async def callback(interaction: discord.Interaction):
-            selected_target_id = select.values[0]
-            selected_target = next(
-                (p for p in self.game_manager.players if str(p.user.id) == selected_target_id),
-                None
+    async def handle_selection(self, interaction: discord.Interaction, args):
+        """Handle a target chosen from a night-action dropdown."""
+        night, actor_id = int(args[0]), int(args[1])
+        if night != self.game_manager.night_number:
+            await interaction.response.send_message("This night is over. Your choice was not recorded.")
+            return
+
+        player = next((p for p in self.game_manager.players if p.user.id == actor_id), None)
+        if player is None or interaction.user.id != actor_id or not player.alive:
+            await interaction.response.send_message("You can't act tonight.")
+            return
+
+        selected_target_id = interaction.data["values"][0]
+        selected_target = next(
+            (p for p in player.role.valid_targets(self.game_manager.get_alive_players())
+             if str(p.user.id) == selected_target_id),
+            None
+        )
+        if selected_target:
+            player.role.previous_target = selected_target
+            await interaction.response.send_message(
+                f"You have selected {selected_target.user.name} as your target."
             )
-            if selected_target:
-                player.role.previous_target = selected_target
-                await interaction.response.send_message(
-                    f"You have selected {selected_target.user.name} as your target."
-                )
-            else:
-                await interaction.response.send_message("Invalid target selected.")
-
-        select.callback = callback
-        await player.user.send("Choose your target for tonight:", view=view)
+        else:
+            await interaction.response.send_message("Invalid target selected.")
 
 
 async def setup(bot):
@@ -1,3 +1,6 @@
+from game.roles import Mafia, Jester
+
+
 class WinConditions:
     def __init__(self, players):
         self.players = players
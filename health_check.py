@@ -1,14 +1,40 @@
 import asyncio
 from aiohttp import web
+from spectator import setup_spectator_routes
+from utils.ratelimit import command_limiter
+from utils.compute import compute_pool
 
 async def health_check(request):
     """Respond to health check requests."""
+    watchdog = request.app.get("watchdog")
+    if watchdog is not None and not watchdog.healthy:
+        return web.Response(status=503, text="UNHEALTHY: event loop stalled (details at /metrics/loop)")
     return web.Response(text="OK")
 
-async def start_health_check_server():
+async def shed_stats(request):
+    """Report how many commands the rate limiter has dropped."""
+    return web.json_response(command_limiter.stats())
+
+async def compute_stats(request):
+    """Report the compute pool's queue and cache usage."""
+    return web.json_response(compute_pool.stats())
+
+async def loop_stats(request):
+    """Report event loop stalls and probe latency seen by the watchdog."""
+    watchdog = request.app.get("watchdog")
+    if watchdog is None:
+        return web.json_response({"error": "loop watchdog is not running"}, status=404)
+    return web.json_response(watchdog.status())
+
+async def start_health_check_server(watchdog=None):
     """Start a lightweight HTTP server for health checks."""
     app = web.Application()
+    app["watchdog"] = watchdog
     app.router.add_get("/", health_check)
+    app.router.add_get("/metrics/shed", shed_stats)
+    app.router.add_get("/metrics/compute", compute_stats)
+    app.router.add_get("/metrics/loop", loop_stats)
+    setup_spectator_routes(app)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, "0.0.0.0", 8080)
@@ -0,0 +1,97 @@
+import sys
+import time
+import logging
+import threading
+import traceback
+
+
+class LoopWatchdog:
+    """Watch the event loop from a background thread and report stalls."""
+
+    def __init__(self, loop, interval=0.5, stall_threshold=1.0, unhealthy_after=3, cooldown=30.0):
+        self.loop = loop
+        self.interval = interval  # Seconds between probes
+        self.stall_threshold = stall_threshold  # Seconds before a probe counts as a stall
+        self.unhealthy_after = unhealthy_after  # Stalled threshold periods in a row before reporting unhealthy
+        self.cooldown = cooldown  # Seconds to keep reporting unhealthy after the last bad stall
+        self.consecutive_stalls = 0
+        self.unhealthy_until = 0.0
+        self.total_stalls = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._loop_thread_id = threading.get_ident()  # Must be created on the loop's thread
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        last_answer = time.monotonic()
+        while not self._stop.wait(self.interval):
+            if self.loop.is_closed():
+                return
+            answered = threading.Event()
+            sent = time.monotonic()
+            self.loop.call_soon_threadsafe(answered.set)
+            if answered.wait(self.stall_threshold):
+                self._record(time.monotonic() - sent)
+                last_answer = time.monotonic()
+                self.consecutive_stalls = 0
+                continue
+
+            # The loop did not answer in time: grab its stack while it is still blocked.
+            logging.warning(
+                "Event loop blocked for more than %.2fs. Loop thread stack:\n%s",
+                self.stall_threshold, self._loop_stack()
+            )
+            # Every threshold period the loop has been unresponsive counts as a stall,
+            # so one long block is as serious as several short ones.
+            while True:
+                self._set_stalls(int((time.monotonic() - last_answer) / self.stall_threshold))
+                if answered.wait(self.interval):
+                    break
+                if self._stop.is_set() or self.loop.is_closed():
+                    return
+            self._record(time.monotonic() - sent)
+            last_answer = time.monotonic()
+            logging.warning("Event loop recovered after %.2fs.", self.last_latency)
+
+    def _set_stalls(self, stalls):
+        if stalls <= self.consecutive_stalls:
+            return
+        self.total_stalls += stalls - self.consecutive_stalls
+        self.consecutive_stalls = stalls
+        if stalls >= self.unhealthy_after:
+            if self.healthy:
+                logging.error("Event loop has stalled %d times in a row. Reporting unhealthy.", self.consecutive_stalls)
+            self.unhealthy_until = time.monotonic() + self.cooldown
+
+    def _record(self, latency):
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def _loop_stack(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return "  <loop thread not found>"
+        return "".join(traceback.format_stack(frame))
+
+    def status(self):
+        return {
+            "healthy": self.healthy,
+            "unhealthy_for": round(max(0.0, self.unhealthy_until - time.monotonic()), 1),
+            "consecutive_stalls": self.consecutive_stalls,
+            "total_stalls": self.total_stalls,
+            "last_latency": round(self.last_latency, 4),
+            "max_latency": round(self.max_latency, 4),
+        }
@@ -0,0 +1,78 @@
+import os
+import json
+import asyncio
+import logging
+
+# "default" leaves asyncio and discord.py's JSON handling untouched; "fast" opts in to uvloop
+# and orjson when they are installed. Pick with BOT_RUNTIME_PROFILE.
+PROFILES = ("default", "fast")
+
+
+def stock_dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=True)
+
+
+def json_codec(profile):
+    """Return (loads, dumps, name) for the JSON codec a profile uses."""
+    if profile == "fast":
+        try:
+            import orjson
+        except ImportError:
+            logging.warning("orjson is not installed; the fast profile falls back to the json module.")
+        else:
+            return orjson.loads, lambda obj: orjson.dumps(obj).decode("utf-8"), "orjson"
+    return json.loads, stock_dumps, "json"
+
+
+def install_event_loop(profile):
+    """Switch asyncio to uvloop for the fast profile. Must run before the loop is created."""
+    if profile != "fast":
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        logging.warning("uvloop is not installed; the fast profile falls back to the asyncio loop.")
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+def install_profile(profile=None):
+    """Apply a runtime profile and return what was actually installed."""
+    profile = profile or os.getenv("BOT_RUNTIME_PROFILE", "default")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown runtime profile {profile!r}. Choose from: {', '.join(PROFILES)}")
+    installed = {"profile": profile, "event_loop": install_event_loop(profile)}
+
+    import discord.utils
+    if profile == "fast":
+        # The gateway and HTTP client both go through these two module attributes.
+        loads, dumps, installed["json"] = json_codec(profile)
+        discord.utils._from_json = loads
+        discord.utils._to_json = dumps
+    else:
+        # Leave discord.py's own choice alone; it uses orjson by itself when installed.
+        installed["json"] = "orjson" if discord.utils.HAS_ORJSON else "json"
+    return installed
+
+
+class PayloadRecorder:
+    """Collect raw gateway payloads for the runtime benchmark and write them out off the loop."""
+
+    def __init__(self, path, limit=5000):
+        self.path = path
+        self.limit = limit
+        self.payloads = []
+
+    async def on_socket_raw_receive(self, msg):
+        if len(self.payloads) >= self.limit:
+            return
+        self.payloads.append(msg)
+        if len(self.payloads) == self.limit:
+            await asyncio.to_thread(self._write)
+            logging.info("Recorded %d gateway payloads to %s", self.limit, self.path)
+
+    def _write(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            for msg in self.payloads:
+                f.write(msg.replace("\n", " ") + "\n")
@@ -0,0 +1,145 @@
+import json
+import asyncio
+from collections import deque
+from aiohttp import web
+
+KEEPALIVE_SECONDS = 15
+
+
+class SpectatorHub:
+    """Public state of every running game, serialized once per change and shared by all watchers."""
+
+    def __init__(self, history=256):
+        self._snapshots = {}  # topic -> JSON bytes of the latest state
+        self._frames = {}  # topic -> SSE frame carrying the latest state
+        self._events = deque(maxlen=history)  # (seq, topic, frame) shared by every subscriber
+        self._seq = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, topic, state):
+        """Record a new state for a topic. Publishing None removes the topic."""
+        body = b"null" if state is None else json.dumps(state, separators=(",", ":")).encode()
+        if body == self._snapshots.get(topic, b"null"):
+            return  # Nothing visible changed
+        if state is None:
+            self._snapshots.pop(topic, None)
+            self._frames.pop(topic, None)
+        self._seq += 1
+        frame = b"id: %d\ndata: {\"topic\":%s,\"state\":%s}\n\n" % (self._seq, json.dumps(topic).encode(), body)
+        if state is not None:
+            self._snapshots[topic] = body
+            self._frames[topic] = frame
+        self._events.append((self._seq, topic, frame))
+        # Wake every waiting subscriber at once; they all read the same frame.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def snapshot(self, topic):
+        return self._snapshots.get(topic)
+
+    def snapshots(self, prefix):
+        return {topic: body for topic, body in self._snapshots.items() if topic.startswith(prefix)}
+
+    async def subscribe(self, prefix=""):
+        """Yield SSE frames: the current state of every matching topic, then each change."""
+        cursor = self._seq
+        for topic, frame in list(self._frames.items()):
+            if topic.startswith(prefix):
+                yield frame
+        while True:
+            changed = self._changed
+            if cursor == self._seq:
+                try:
+                    await asyncio.wait_for(changed.wait(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+            if self._events and self._events[0][0] > cursor + 1:
+                # We fell behind the shared buffer; resend the latest state instead.
+                cursor = self._seq
+                for topic, frame in list(self._frames.items()):
+                    if topic.startswith(prefix):
+                        yield frame
+                continue
+            for seq, topic, frame in list(self._events):
+                if seq > cursor:
+                    cursor = seq
+                    if topic.startswith(prefix):
+                        yield frame
+
+
+def mafia_state(game_manager):
+    """Public view of the Mafia game. Roles stay hidden."""
+    return {
+        "started": game_manager.game_started,
+        "host": game_manager.host.name if game_manager.host else None,
+        "phase": type(game_manager.phase).__name__ if game_manager.phase else None,
+        "night": game_manager.night_number,
+        "players": [{"name": player.user.name, "alive": player.alive} for player in game_manager.players],
+    }
+
+
+def blackjack_state(channel_id, game, results=None):
+    """Public view of a blackjack table. The house hole card stays hidden until the round ends."""
+    players = []
+    for player in game.players:
+        hands = [
+            {"cards": hand, "total": game.hand_value(hand), "done": i in game.stands.get(player.id, ())}
+            for i, hand in enumerate(game.hands.get(player.id, []))
+        ]
+        players.append({"name": player.name, "hands": hands})
+    if game.finished:
+        house = {"cards": game.house, "total": game.hand_value(game.house)}
+    else:
+        house = {"cards": game.house[:1], "total": None}
+    return {
+        "channel_id": channel_id,
+        "started": game.started,
+        "finished": game.finished,
+        "simultaneous": game.simultaneous,
+        "players": players,
+        "house": house,
+        "results": results,
+    }
+
+
+def json_response(body):
+    return web.Response(body=body, content_type="application/json")
+
+
+async def get_mafia(request):
+    return json_response(hub.snapshot("mafia") or b"null")
+
+
+async def get_blackjack_tables(request):
+    tables = hub.snapshots("blackjack:")
+    return json_response(b"[" + b",".join(tables.values()) + b"]")
+
+
+async def get_blackjack_table(request):
+    body = hub.snapshot(f"blackjack:{request.match_info['channel_id']}")
+    if body is None:
+        raise web.HTTPNotFound(text="No table in that channel.")
+    return json_response(body)
+
+
+async def stream(request):
+    """Server-sent events for every change, optionally filtered with ?topic=blackjack"""
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    try:
+        async for frame in hub.subscribe(request.query.get("topic", "")):
+            await response.write(frame)
+    except ConnectionResetError:
+        pass  # The watcher went away
+    return response
+
+
+def setup_spectator_routes(app):
+    app.router.add_get("/api/mafia", get_mafia)
+    app.router.add_get("/api/blackjack", get_blackjack_tables)
+    app.router.add_get("/api/blackjack/{channel_id}", get_blackjack_table)
+    app.router.add_get("/api/stream", stream)
+
+
+hub = SpectatorHub()
@@ -0,0 +1,28 @@
+import random
+import time
+
+
+class JitteredBackoff:
+    """Exponential backoff with full jitter, reset after a period of stability."""
+
+    def __init__(self, base=0.25, cap=60.0, reset_after=300.0):
+        self.base = base  # Upper bound of the first delay, in seconds
+        self.cap = cap  # Largest delay we will ever wait
+        self.reset_after = reset_after  # Seconds of uptime that count as "stable"
+        self.attempts = 0
+        self._last_failure = None
+
+    def delay(self):
+        """Return how long to wait before the next attempt."""
+        now = time.monotonic()
+        if self._last_failure is not None and now - self._last_failure > self.reset_after:
+            self.attempts = 0
+        self._last_failure = now
+        ceiling = min(self.cap, self.base * (2 ** self.attempts))
+        self.attempts += 1
+        # Full jitter spreads a fleet of restarting bots across the whole window.
+        return random.uniform(0, ceiling)
+
+    def reset(self):
+        self.attempts = 0
+        self._last_failure = None
@@ -0,0 +1,122 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ComputeQueueFull(Exception):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+class ComputePool:
+    """Run CPU-heavy work in worker processes so it never blocks the event loop.
+
+    Jobs must be picklable module-level functions. Results are cached by
+    (function, arguments), and identical jobs already in flight are shared
+    rather than submitted twice. A job that has started running can't be
+    interrupted; on timeout or cancellation it keeps its worker, and counts as
+    pending, until it finishes.
+    """
+
+    def __init__(self, workers=None, max_pending=32, cache_size=256, default_timeout=30.0):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.default_timeout = default_timeout
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self._executor = None
+        self._cache = OrderedDict()  # job key -> result, least recently used first
+        self._in_flight = {}  # job key -> [future, number of waiters]
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def start(self):
+        """Fork the workers now so the first real job doesn't pay for it."""
+        for _ in range(self.workers):
+            self.executor.submit(int)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def job_key(fn, args, kwargs):
+        key = (fn.__module__, fn.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None  # Unhashable arguments: run it, but don't cache
+        return key
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        """Run fn(*args, **kwargs) in a worker process and return its result."""
+        key = self.job_key(fn, args, kwargs)
+        if key is not None and key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        self.misses += 1
+
+        entry = self._in_flight.get(key) if key is not None else None
+        if entry is None:
+            if self.pending >= self.max_pending:
+                raise ComputeQueueFull(f"{self.pending} jobs are already queued.")
+            loop = asyncio.get_running_loop()
+            job = self.executor.submit(fn, *args, **kwargs)
+            self.pending += 1
+            entry = [job, asyncio.wrap_future(job), 0]
+            if key is not None:
+                self._in_flight[key] = entry
+            # Track the job itself, not the asyncio wrapper: an abandoned job that is
+            # already running still holds its worker until it finishes.
+            job.add_done_callback(lambda job: loop.call_soon_threadsafe(self._job_done, key, job))
+
+        job, future = entry[0], entry[1]
+        entry[2] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.default_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Nobody else wants it; drop it if it hasn't started yet
+            if entry[2] == 1 and job.cancel() and key is not None:
+                self._in_flight.pop(key, None)
+            raise
+        finally:
+            entry[2] -= 1
+
+    def _job_done(self, key, job):
+        self.pending -= 1
+        if key is None:
+            return
+        if self._in_flight.get(key, [None])[0] is job:
+            del self._in_flight[key]
+        if job.cancelled():
+            return
+        if job.exception() is not None:
+            logging.error("Compute job %s failed: %s", key[1], job.exception())
+            return
+        self._cache[key] = job.result()
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+compute_pool = ComputePool(
+    workers=int(os.getenv("COMPUTE_WORKERS", "0")) or None,
+    max_pending=int(os.getenv("COMPUTE_MAX_PENDING", "32"))
+)
@@ -16,5 +16,15 @@ def setup_database(db_file):
     )
     """)
 
+    # Create a table for per-guild settings, stored as JSON values
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS guild_settings (
+        guild_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (guild_id, key)
+    )
+    """)
+
     conn.commit()
     conn.close()
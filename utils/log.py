@@ -0,0 +1,118 @@
+import json
+import queue
+import atexit
+import random
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+# Fields attached to every record logged from the current task (guild, command, session...)
+log_context = contextvars.ContextVar("log_context", default={})
+
+
+def bind_context(**fields):
+    """Add fields to the structured context of everything logged from the current task."""
+    return log_context.set({**log_context.get(), **fields})
+
+
+def parse_sampling(spec):
+    """Turn "discord=0.1,game=0.5" into {"discord": 0.1, "game": 0.5}."""
+    rates = {}
+    for item in (spec or "").split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Copy the caller's log context onto the record before it leaves the event loop thread."""
+
+    def filter(self, record):
+        record.context = log_context.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO and DEBUG records per logger. Warnings and errors always pass."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates  # logger name (or dotted prefix) -> fraction of records kept
+        self._resolved = {}
+
+    def rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the record's context merged in."""
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(getattr(record, "context", {}))
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+# Immutable argument types that are safe to format later on the listener thread
+SAFE_ARG_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """A QueueHandler that leaves message formatting to the listener thread where it is safe to."""
+
+    def prepare(self, record):
+        # The stock handler formats the message here, on the caller's thread. Records are
+        # handed over unformatted instead, so the event loop only pays for a queue put.
+        # Objects like lists or discord models may change before the listener gets to
+        # them, so records with such arguments are still formatted here.
+        args = record.args.values() if isinstance(record.args, dict) else record.args or ()
+        if not all(isinstance(arg, SAFE_ARG_TYPES) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def setup_logging(level=logging.INFO, sampling=None):
+    """Route all logging through a queue drained by a background thread.
+
+    Returns the QueueListener; it is stopped automatically at exit.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sampling or {}))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    return listener
@@ -0,0 +1,136 @@
+import os
+import time
+from collections import Counter
+
+# (tokens per second, burst) for each command, per user and per channel
+DEFAULT_USER_LIMIT = (1.0, 5)
+DEFAULT_CHANNEL_LIMIT = (4.0, 20)
+USER_LIMITS = {
+    "bj_hit": (2.0, 5),
+    "bj_stand": (2.0, 5),
+    "join": (0.5, 3),
+    "leave": (0.5, 3),
+    "party": (0.2, 2),
+    "bj_join": (0.5, 3),
+    "bj_options": (0.5, 3),
+    "settings": (0.5, 3),
+    "bj_odds": (0.5, 2),
+    "balance": (0.05, 1),
+}
+CHANNEL_LIMITS = {
+    "party": (0.5, 3),
+    "bj_options": (1.0, 5),
+}
+
+NOTICE_INTERVAL = 10.0  # Seconds between "slow down" replies to the same user
+PRUNE_EVERY = 1000  # Checks between sweeps of idle buckets
+
+
+def parse_limits(spec):
+    """Turn "bj_hit=2/5,party=0.2/2" into {"bj_hit": (2.0, 5), "party": (0.2, 2)}."""
+    limits = {}
+    for item in (spec or "").split(","):
+        name, _, limit = item.partition("=")
+        rate, _, burst = limit.partition("/")
+        if name.strip() and rate.strip():
+            limits[name.strip()] = (float(rate), int(burst or 1))
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class CommandLimiter:
+    """Token buckets per (command, user) and (command, channel), checked before dispatch."""
+
+    def __init__(self, user_limits=None, channel_limits=None):
+        self.user_limits = {**USER_LIMITS, **(user_limits or {})}
+        self.channel_limits = {**CHANNEL_LIMITS, **(channel_limits or {})}
+        self._buckets = {}  # (scope, id, command) -> TokenBucket
+        self._last_notice = {}  # user id -> time of the last "slow down" reply
+        self.shed = Counter()  # (command, scope) -> dropped invocations
+        self.allowed = 0
+        self._checks = 0
+
+    def configure(self, command, rate, burst, scope="user"):
+        limits = self.user_limits if scope == "user" else self.channel_limits
+        limits[command] = (rate, burst)
+        for key in [key for key in self._buckets if key[0] == scope and key[2] == command]:
+            del self._buckets[key]
+
+    def _bucket(self, scope, key_id, command, limit, now):
+        key = (scope, key_id, command)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(limit[0], limit[1], now)
+        return bucket
+
+    def allow(self, command, user_id, channel_id):
+        """Take a token for this invocation. Returns (allowed, scope that refused it)."""
+        now = time.monotonic()
+        self._checks += 1
+        if self._checks % PRUNE_EVERY == 0:
+            self.prune(now)
+
+        user = self._bucket("user", user_id, command, self.user_limits.get(command, DEFAULT_USER_LIMIT), now)
+        if not user.take(now):
+            self.shed[(command, "user")] += 1
+            return False, "user"
+        channel = self._bucket("channel", channel_id, command, self.channel_limits.get(command, DEFAULT_CHANNEL_LIMIT), now)
+        if not channel.take(now):
+            user.tokens += 1  # The user's request never ran, so give their token back
+            self.shed[(command, "channel")] += 1
+            return False, "channel"
+        self.allowed += 1
+        return True, None
+
+    def should_notify(self, user_id):
+        """Coalesce "slow down" replies to at most one per user per NOTICE_INTERVAL."""
+        now = time.monotonic()
+        if now - self._last_notice.get(user_id, 0.0) < NOTICE_INTERVAL:
+            return False
+        self._last_notice[user_id] = now
+        return True
+
+    def prune(self, now=None):
+        """Forget buckets that have refilled completely; they behave exactly like new ones."""
+        now = time.monotonic() if now is None else now
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._buckets[key]
+        for user_id, noticed in list(self._last_notice.items()):
+            if now - noticed >= NOTICE_INTERVAL:
+                del self._last_notice[user_id]
+
+    def stats(self):
+        return {
+            "allowed": self.allowed,
+            "shed_total": sum(self.shed.values()),
+            "shed": {f"{command}:{scope}": count for (command, scope), count in self.shed.items()},
+            "tracked_buckets": len(self._buckets),
+        }
+
+
+command_limiter = CommandLimiter(
+    user_limits=parse_limits(os.getenv("COMMAND_USER_LIMITS")),
+    channel_limits=parse_limits(os.getenv("COMMAND_CHANNEL_LIMITS"))
+)
@@ -0,0 +1,128 @@
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+from utils.database import setup_database
+
+# Every setting a guild can override, with the value used when it hasn't
+DEFAULT_SETTINGS = {
+    "prefix": "!",
+    "deck_mode": "normal",
+    "allow_double": True,
+    "allow_split": True,
+    "biased_starts": False,
+    "simultaneous": False,
+    "round_timeout": 60,
+}
+
+# Settings that are copied onto every new BlackjackGame
+TABLE_RULES = ["deck_mode", "allow_double", "allow_split", "biased_starts", "simultaneous", "round_timeout"]
+
+CHOICES = {
+    "deck_mode": ["normal", "stacked"],
+}
+
+
+def coerce(key, raw):
+    """Convert a value typed in chat into the type of the setting's default."""
+    if key not in DEFAULT_SETTINGS:
+        raise ValueError(f"Unknown setting `{key}`. Available: {', '.join(DEFAULT_SETTINGS)}")
+    default = DEFAULT_SETTINGS[key]
+    raw = raw.strip()
+    if isinstance(default, bool):
+        if raw.lower() in ("on", "true", "yes", "1"):
+            return True
+        if raw.lower() in ("off", "false", "no", "0"):
+            return False
+        raise ValueError(f"`{key}` must be on or off.")
+    if isinstance(default, int):
+        if not raw.isdigit() or int(raw) <= 0:
+            raise ValueError(f"`{key}` must be a positive whole number.")
+        return int(raw)
+    if key in CHOICES and raw.lower() not in CHOICES[key]:
+        raise ValueError(f"`{key}` must be one of: {', '.join(CHOICES[key])}")
+    if key == "prefix" and not 1 <= len(raw) <= 5:
+        raise ValueError("The prefix must be between 1 and 5 characters.")
+    return raw.lower() if key in CHOICES else raw
+
+
+class GuildSettings:
+    """Per-guild settings served from memory and written to SQLite in the background."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._cache = {}  # guild_id -> complete settings dict
+        self._dirty = {}  # (guild_id, key) -> value waiting to be written
+        self._flush_task = None
+
+    async def load(self):
+        """Create the table if needed and read every guild's settings into memory."""
+        rows = await asyncio.to_thread(self._read_all)
+        for guild_id, key, value in rows:
+            if key in DEFAULT_SETTINGS:
+                self._settings_for(guild_id)[key] = json.loads(value)
+        logging.info("Loaded settings for %d guild(s).", len(self._cache))
+
+    def get(self, guild_id, key):
+        settings = self._cache.get(guild_id)
+        if settings is None:
+            return DEFAULT_SETTINGS[key]
+        return settings[key]
+
+    def all(self, guild_id):
+        return dict(self._cache.get(guild_id, DEFAULT_SETTINGS))
+
+    def update(self, guild_id, changes):
+        """Apply changes immediately and schedule them to be persisted."""
+        for key in changes:
+            if key not in DEFAULT_SETTINGS:
+                raise KeyError(key)
+        self._settings_for(guild_id).update(changes)
+        for key, value in changes.items():
+            self._dirty[(guild_id, key)] = value
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    def set(self, guild_id, key, value):
+        self.update(guild_id, {key: value})
+
+    async def flush(self):
+        """Write every pending change. Changes made while writing go out in the next batch."""
+        while self._dirty:
+            batch, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except sqlite3.Error as e:
+                logging.error("Failed to save guild settings: %s", e)
+                # Keep newer values if the same keys changed in the meantime
+                self._dirty = {**batch, **self._dirty}
+                return
+
+    def _settings_for(self, guild_id):
+        settings = self._cache.get(guild_id)
+        if settings is None:
+            settings = self._cache[guild_id] = dict(DEFAULT_SETTINGS)
+        return settings
+
+    def _read_all(self):
+        setup_database(self.db_file)
+        conn = sqlite3.connect(self.db_file)
+        try:
+            return conn.execute("SELECT guild_id, key, value FROM guild_settings").fetchall()
+        finally:
+            conn.close()
+
+    def _write(self, batch):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO guild_settings (guild_id, key, value) VALUES (?, ?, ?)",
+                [(guild_id, key, json.dumps(value)) for (guild_id, key), value in batch.items()]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+guild_settings = GuildSettings(os.getenv("DATABASE_FILE", "dankfather.db"))